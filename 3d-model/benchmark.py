@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import shapely
+
+from modules.buildings import building_heights, clean_polygons, clip_to_box
+from modules.export import export_meshes
+from modules.extrude import extrude_buildings, summarize_failures
+from modules.terrain import build_terrain, elevation_at_xy, terrain_axes
+
+BUILDINGS_CRS = "EPSG:32630"
+DEM_CRS = "EPSG:4326"
+ORIGIN = (430000.0, 4810000.0)
+# Mean spacing between synthetic buildings, in metres.
+SPACING = 40.0
+
+
+def make_dem(path, extent, resolution=0.00005, seed=0):
+    """Writes a procedural DEM GeoTIFF covering ``extent`` metres from ORIGIN."""
+    import rasterio
+    from pyproj import Transformer
+    from rasterio.transform import from_origin
+
+    transformer = Transformer.from_crs(BUILDINGS_CRS, DEM_CRS, always_xy=True)
+    lon, lat = transformer.transform(
+        [ORIGIN[0] - 500, ORIGIN[0] + extent + 500], [ORIGIN[1] - 500, ORIGIN[1] + extent + 500]
+    )
+    width = int(np.ceil((lon[1] - lon[0]) / resolution))
+    height = int(np.ceil((lat[1] - lat[0]) / resolution))
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    z = 40.0 + 35.0 * np.sin(xx / 180.0) * np.cos(yy / 240.0) + 15.0 * np.sin((xx + yy) / 60.0)
+    z += rng.normal(0.0, 0.5, z.shape).astype(np.float32)
+    z[:20, :20] = -9999.0
+
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=width,
+        height=height,
+        count=1,
+        dtype="float32",
+        crs=DEM_CRS,
+        transform=from_origin(lon[0], lat[1], resolution, resolution),
+        nodata=-9999.0,
+        tiled=True,
+    ) as dem:
+        dem.write(z.astype(np.float32), 1)
+
+
+def make_buildings(n, seed=0):
+    """Returns ``n`` random footprints with a mix of height/levels tags, some with holes."""
+    import geopandas as gpd
+
+    rng = np.random.default_rng(seed)
+    extent = np.sqrt(n) * SPACING
+    centers = np.column_stack([ORIGIN[0] + rng.uniform(0, extent, n), ORIGIN[1] + rng.uniform(0, extent, n)])
+    half = np.column_stack([rng.uniform(3, 18, n), rng.uniform(3, 18, n)])
+    angle = rng.uniform(0, np.pi, n)
+
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]], dtype=float)
+    local = corners[None, :, :] * half[:, None, :]
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    coords = np.stack(
+        [local[..., 0] * cos - local[..., 1] * sin, local[..., 0] * sin + local[..., 1] * cos], axis=-1
+    ) + centers[:, None, :]
+    geoms = shapely.polygons(coords)
+
+    with_hole = rng.random(n) < 0.1
+    holes = shapely.buffer(shapely.centroid(geoms[with_hole]), np.minimum(half[with_hole].min(axis=1) * 0.4, 4.0))
+    geoms[with_hole] = shapely.difference(geoms[with_hole], holes)
+
+    heights = np.full(n, None, dtype=object)
+    r = rng.random(n)
+    heights[r < 0.4] = np.round(rng.uniform(4, 80, (r < 0.4).sum()), 1).astype(str)
+    heights[(r >= 0.4) & (r < 0.5)] = [f"{int(h)} m" for h in rng.uniform(4, 40, ((r >= 0.4) & (r < 0.5)).sum())]
+    levels = np.where(rng.random(n) < 0.5, rng.integers(1, 12, n).astype(str), None)
+
+    return gpd.GeoDataFrame({"height": heights, "building:levels": levels}, geometry=geoms, crs=BUILDINGS_CRS)
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process and of its largest finished child, or None where unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    unit = 2**20 if sys.platform == "darwin" else 2**10
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return own, children
+
+
+class _Stages:
+    # tracemalloc would slow the stages down several times, so memory is
+    # taken from the process high-water marks. Those only ever grow, so
+    # each stage records how much it raised them; each scale runs in a
+    # fresh process so earlier scales do not hide later increases.
+    def __init__(self):
+        self.results = {}
+        self.mark = _peak_rss_mb()
+
+    def run(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.results[name] = {"seconds": round(elapsed, 4)}
+
+        peak = _peak_rss_mb()
+        if peak is None:
+            print(f"  {name:<10} {elapsed:8.3f} s")
+            return value
+
+        own = peak[0] - self.mark[0]
+        children = peak[1] - self.mark[1]
+        self.mark = peak
+        self.results[name].update(rss_increase_mb=round(own, 1), children_rss_increase_mb=round(children, 1))
+        print(f"  {name:<10} {elapsed:8.3f} s {own:+9.1f} MB {children:+9.1f} MB in workers")
+        return value
+
+
+def run_scale(n, workdir, grid_step=10.0, workers=1, seed=0):
+    print(f"{n} buildings")
+    footprints = make_buildings(n, seed)
+    extent = np.sqrt(n) * SPACING
+    dem_path = os.path.join(workdir, f"dem_{n}.tif")
+    make_dem(dem_path, extent, seed=seed)
+    bounds = (ORIGIN[0], ORIGIN[1], ORIGIN[0] + extent, ORIGIN[1] + extent)
+
+    stages = _Stages()
+    buildings = stages.run("clean", lambda: clean_polygons(clip_to_box(footprints, bounds)))
+    buildings["height"] = stages.run("heights", building_heights, buildings)
+
+    def terrain():
+        xs, ys = terrain_axes(bounds, grid_step)
+        return build_terrain(dem_path, xs, ys, BUILDINGS_CRS)
+
+    terrain_mesh, (xs, ys, zgrid) = stages.run("terrain", terrain)
+    anchors = buildings.geometry.representative_point()
+    base_z = elevation_at_xy(anchors.x.to_numpy(), anchors.y.to_numpy(), xs, ys, zgrid)
+
+    buildings_mesh, failures = stages.run(
+        "extrusion", extrude_buildings, buildings.geometry, buildings.height, base_z, workers=workers
+    )
+    print(f"  {summarize_failures(failures, len(buildings))}")
+
+    meshes = [m for m in (terrain_mesh, buildings_mesh) if m is not None]
+    names = ["terrain", "buildings"][: len(meshes)]
+    triangles = stages.run(
+        "export",
+        export_meshes,
+        meshes,
+        names,
+        glb_path=os.path.join(workdir, f"model_{n}.glb"),
+        stl_path=os.path.join(workdir, f"model_{n}.stl"),
+        offset=(-bounds[0], -bounds[1], 0.0),
+    )
+
+    peak = _peak_rss_mb()
+    return {
+        "buildings": n,
+        "peak_rss_mb": round(max(peak), 1) if peak is not None else None,
+        "cleaned": len(buildings),
+        "failed_extrusions": len(failures),
+        "triangles": int(triangles),
+        "watertight": {
+            "terrain": bool(terrain_mesh.is_watertight),
+            "buildings": bool(buildings_mesh is not None and buildings_mesh.is_watertight),
+        },
+        "stages": stages.results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns the list of regressions of ``results`` against ``baseline``."""
+    regressions = []
+    previous = {run["buildings"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        base = previous.get(run["buildings"])
+        if base is None:
+            continue
+        n = run["buildings"]
+        for stage, stats in run["stages"].items():
+            old = base["stages"].get(stage)
+            if old is None or old["seconds"] < 0.05:
+                continue
+            ratio = stats["seconds"] / old["seconds"]
+            print(f"{n:>8} {stage:<10} {old['seconds']:8.3f} s -> {stats['seconds']:8.3f} s  x{ratio:.2f}")
+            if ratio > tolerance:
+                regressions.append(f"{n} buildings: {stage} is {ratio:.2f}x slower")
+        if run.get("peak_rss_mb") and base.get("peak_rss_mb"):
+            ratio = run["peak_rss_mb"] / base["peak_rss_mb"]
+            print(f"{n:>8} {'memory':<10} {base['peak_rss_mb']:8.1f} MB -> {run['peak_rss_mb']:8.1f} MB  x{ratio:.2f}")
+            if ratio > tolerance:
+                regressions.append(f"{n} buildings: peak memory is {ratio:.2f}x higher")
+        if run["triangles"] != base["triangles"]:
+            regressions.append(f"{n} buildings: {base['triangles']} -> {run['triangles']} triangles")
+        for name, ok in run["watertight"].items():
+            if base["watertight"].get(name) and not ok:
+                regressions.append(f"{n} buildings: {name} mesh is no longer watertight")
+    return regressions
+
+
+def _run_scale_process(n, workdir, args):
+    """Runs one scale in a fresh interpreter so its memory marks start from scratch."""
+    result_path = os.path.join(workdir, f"result_{n}.json")
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--run-scale", str(n),
+        "--grid-step", str(args.grid_step),
+        "--workers", str(args.workers),
+        "--seed", str(args.seed),
+        "--workdir", workdir,
+        "--output", result_path,
+    ]
+    subprocess.run(command, check=True)
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the 3D model pipeline on synthetic data.")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1000, 10000, 100000], help="building counts")
+    parser.add_argument("--grid-step", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1, help="extrusion worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="where to write the synthetic DEMs and models (default: temp dir)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON results file")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown or memory growth ratio")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="citymodel-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    if args.run_scale is not None:
+        run = run_scale(args.run_scale, workdir, args.grid_step, args.workers, args.seed)
+        with open(args.output, "w") as f:
+            json.dump(run, f)
+        return
+
+    results = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "grid_step": args.grid_step,
+        "workers": args.workers,
+        "runs": [_run_scale_process(n, workdir, args) for n in args.scales],
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import shapely
+
+TAG_COLUMNS = ["height", "building:levels"]
+
+
+def _footprint_columns(gdf):
+    gdf = gdf.reset_index(drop=True)
+    for col in TAG_COLUMNS:
+        if col in gdf:
+            gdf[col] = [None if v is None or str(v) == "nan" else str(v) for v in gdf[col]]
+        else:
+            gdf[col] = None
+    return gdf[TAG_COLUMNS + ["geometry"]]
+
+
+def download_footprints(place, tags):
+    import osmnx as ox
+
+    buildings = ox.features_from_place(place, tags)
+    buildings = ox.projection.project_gdf(buildings)
+    return _footprint_columns(buildings)
+
+
+def read_footprints(path):
+    import geopandas as gpd
+    import osmnx as ox
+
+    if os.path.splitext(path)[1].lower() == ".parquet":
+        buildings = gpd.read_parquet(path)
+    else:
+        buildings = gpd.read_file(path)
+    if buildings.crs is None:
+        raise RuntimeError(f"Footprints file {path} has no CRS.")
+    if buildings.crs.is_geographic:
+        buildings = ox.projection.project_gdf(buildings)
+    return _footprint_columns(buildings)
+
+
+def clip_to_box(gdf, bounds):
+    """Cuts the footprints to ``bounds``.
+
+    Candidates come from the frame's STRtree spatial index, and only the
+    ones crossing the box edge are intersected; the rest are kept as is.
+    """
+    clip_poly = shapely.box(*bounds)
+    shapely.prepare(clip_poly)
+
+    clipped = gdf.iloc[gdf.sindex.query(clip_poly, predicate="intersects")].copy()
+    geoms = np.asarray(clipped.geometry.values, dtype=object)
+    # Repair invalid footprints first: GEOS cannot intersect them, and a
+    # self-intersecting one would be dropped by the area filter below.
+    invalid = ~shapely.is_valid(geoms)
+    geoms[invalid] = shapely.buffer(geoms[invalid], 0)
+    crossing = ~shapely.contains_properly(clip_poly, geoms)
+    geoms[crossing] = shapely.intersection(geoms[crossing], clip_poly)
+    clipped["geometry"] = geoms
+
+    clipped = clipped.explode(index_parts=False)
+    clipped = clipped[clipped.geometry.type == "Polygon"]
+    return clipped[clipped.geometry.area > 0]
+
+
+def wgs84_to_projected(bounds_wgs84, target_crs):
+    from pyproj import Transformer
+
+    min_lon, min_lat, max_lon, max_lat = bounds_wgs84
+    transformer = Transformer.from_crs("EPSG:4326", target_crs, always_xy=True)
+    x1, y1 = transformer.transform(min_lon, min_lat)
+    x2, y2 = transformer.transform(max_lon, max_lat)
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+def clean_polygons(gdf, simplify_tolerance=1.0, min_area=20.0):
+    gdf = gdf[gdf.geometry.notnull()]
+    gdf = gdf[gdf.geometry.type.isin(["Polygon", "MultiPolygon"])]
+    gdf = gdf.explode(index_parts=False)
+
+    # Only invalid footprints need the buffer(0) repair. It can split them
+    # into several parts, so explode again before working on plain Polygons.
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.buffer(geoms[invalid], 0)
+        gdf["geometry"] = geoms
+        gdf = gdf.explode(index_parts=False)
+        gdf = gdf[gdf.geometry.type == "Polygon"]
+        geoms = np.asarray(gdf.geometry.values, dtype=object)
+
+    keep = shapely.is_valid(geoms) & ~shapely.is_empty(geoms)
+    geoms = shapely.simplify(geoms[keep], simplify_tolerance, preserve_topology=True)
+    geoms = shapely.polygons(shapely.get_exterior_ring(geoms))
+
+    gdf = gdf[keep].copy()
+    gdf["geometry"] = geoms
+    gdf["area_m2"] = shapely.area(geoms)
+    gdf = gdf[gdf.area_m2 >= min_area]
+    return gdf.reset_index(drop=True)
+
+
+def parse_height(raw_height, raw_levels):
+    if raw_height is not None and str(raw_height) != "nan":
+        try:
+            return float(str(raw_height).replace("m", ""))
+        except Exception:
+            pass
+    if raw_levels is not None and str(raw_levels) != "nan":
+        try:
+            return float(str(raw_levels)) * 3.0
+        except Exception:
+            pass
+    return 12.0
+
+
+def building_heights(gdf, max_height=60.0):
+    raw_heights = gdf.get("height", [None] * len(gdf))
+    raw_levels = gdf.get("building:levels", [None] * len(gdf))
+    heights = [min(parse_height(h, lvl), max_height) for h, lvl in zip(raw_heights, raw_levels)]
+    return np.asarray(heights, dtype=float)
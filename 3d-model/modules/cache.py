@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def file_signature(path):
+    """Identifies a local input file by its absolute path, size and mtime."""
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+class StageCache:
+    """On-disk cache of pipeline stage outputs, addressed by a hash of their inputs.
+
+    GeoDataFrames are stored as GeoParquet and array bundles as ``.npz``.
+    Stage keys are meant to include the key of the stage they were derived
+    from, so changing an early input invalidates everything downstream.
+    """
+
+    def __init__(self, root, enabled=True):
+        self.root = root
+        self.enabled = enabled
+
+    def key(self, stage, **inputs):
+        payload = json.dumps({"stage": stage, **inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+
+    def _path(self, stage, key, ext):
+        return os.path.join(self.root, stage, f"{key}{ext}")
+
+    def has(self, stage, key, ext):
+        return self.enabled and os.path.exists(self._path(stage, key, ext))
+
+    def _write(self, stage, key, ext, writer):
+        path = self._path(stage, key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            writer(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def frame(self, stage, key, compute):
+        """Returns the cached GeoDataFrame for ``key``, computing and storing it on a miss."""
+        import geopandas as gpd
+
+        if self.has(stage, key, ".parquet"):
+            print(f"[cache] {stage}: hit {key}")
+            return gpd.read_parquet(self._path(stage, key, ".parquet"))
+
+        gdf = compute()
+        if self.enabled:
+            self._write(stage, key, ".parquet", gdf.to_parquet)
+        return gdf
+
+    def arrays(self, stage, key, compute):
+        """Returns the cached dict of arrays for ``key``, computing and storing it on a miss."""
+        if self.has(stage, key, ".npz"):
+            print(f"[cache] {stage}: hit {key}")
+            with np.load(self._path(stage, key, ".npz")) as data:
+                return {name: data[name] for name in data.files}
+
+        arrays = compute()
+        if self.enabled:
+            def write(tmp):
+                with open(tmp, "wb") as f:
+                    np.savez(f, **arrays)
+
+            self._write(stage, key, ".npz", write)
+        return arrays
@@ -0,0 +1,171 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+# Faces per block of STL records, so the temporaries stay bounded (~50 MB per
+# million faces) whatever the mesh size.
+STL_BLOCK = 1_000_000
+
+_GL_ARRAY_BUFFER = 34962
+_GL_ELEMENT_ARRAY_BUFFER = 34963
+_GL_FLOAT = 5126
+_GL_UNSIGNED_SHORT = 5123
+_GL_UNSIGNED_INT = 5125
+
+
+def prepare_mesh(mesh, offset=(0.0, 0.0, 0.0), weld=False, drop_degenerate=False, tolerance=1e-5):
+    """Returns translated float32 vertices and uint32 faces for ``mesh`` without modifying it.
+
+    ``weld`` merges vertices closer than ``tolerance``; ``drop_degenerate``
+    removes faces with repeated corners or zero area.
+    """
+    vertices = np.asarray(mesh.vertices, dtype=float) + np.asarray(offset, dtype=float)
+    faces = np.asarray(mesh.faces, dtype=np.int64)
+
+    if weld and len(vertices):
+        keys = np.round(vertices / tolerance).astype(np.int64)
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        vertices = vertices[first]
+        faces = inverse.reshape(-1)[faces]
+
+    if drop_degenerate and len(faces):
+        tri = vertices[faces]
+        area2 = np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1)
+        keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+        keep &= area2 > tolerance * tolerance
+        faces = faces[keep]
+        used = np.unique(faces)
+        remap = np.full(len(vertices), -1, dtype=np.int64)
+        remap[used] = np.arange(len(used))
+        vertices = vertices[used]
+        faces = remap[faces]
+
+    return vertices.astype(np.float32), faces.astype(np.uint32)
+
+
+def _stl_records(vertices, faces):
+    records = np.zeros(len(faces), dtype=STL_RECORD)
+    tri = vertices[faces]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    records["normal"] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    records["vertices"] = tri
+    return records
+
+
+def _pad4(f, length, byte=b"\x00"):
+    pad = -length % 4
+    f.write(byte * pad)
+    return length + pad
+
+
+def export_meshes(meshes, names, glb_path=None, stl_path=None, offset=(0.0, 0.0, 0.0), weld=False, drop_degenerate=False):
+    """Writes ``meshes`` to a binary STL and/or a GLB, one mesh at a time.
+
+    Each mesh is converted once to float32/uint32 buffers that are written
+    straight to the GLB binary chunk, and STL records are built and written
+    in blocks of ``STL_BLOCK`` faces, so the geometry is never concatenated
+    or copied as a whole. Returns the number of
+    triangles written; raises RuntimeError, writing nothing, if there are
+    none.
+    """
+    stl = open(stl_path, "wb") if stl_path else None
+    bin_chunk = tempfile.TemporaryFile() if glb_path else None
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{"nodes": []}],
+        "nodes": [],
+        "meshes": [],
+        "accessors": [],
+        "bufferViews": [],
+        "buffers": [],
+    }
+    bin_length = 0
+    triangles = 0
+
+    try:
+        if stl:
+            stl.write(b"\x00" * 80)
+            stl.write(struct.pack("<I", 0))
+
+        for mesh, name in zip(meshes, names):
+            vertices, faces = prepare_mesh(mesh, offset, weld=weld, drop_degenerate=drop_degenerate)
+            if len(faces) == 0:
+                continue
+            triangles += len(faces)
+
+            if stl:
+                for start in range(0, len(faces), STL_BLOCK):
+                    stl.write(_stl_records(vertices, faces[start:start + STL_BLOCK]))
+
+            if bin_chunk:
+                indices = faces.astype(np.uint16) if len(vertices) < 65536 else faces
+                for data, target in ((vertices, _GL_ARRAY_BUFFER), (indices, _GL_ELEMENT_ARRAY_BUFFER)):
+                    gltf["bufferViews"].append(
+                        {"buffer": 0, "byteOffset": bin_length, "byteLength": data.nbytes, "target": target}
+                    )
+                    bin_chunk.write(data)
+                    bin_length = _pad4(bin_chunk, bin_length + data.nbytes)
+
+                view = len(gltf["bufferViews"]) - 2
+                accessor = len(gltf["accessors"])
+                gltf["accessors"].append(
+                    {
+                        "bufferView": view,
+                        "componentType": _GL_FLOAT,
+                        "count": len(vertices),
+                        "type": "VEC3",
+                        "min": vertices.min(axis=0).tolist(),
+                        "max": vertices.max(axis=0).tolist(),
+                    }
+                )
+                gltf["accessors"].append(
+                    {
+                        "bufferView": view + 1,
+                        "componentType": _GL_UNSIGNED_SHORT if indices.dtype == np.uint16 else _GL_UNSIGNED_INT,
+                        "count": indices.size,
+                        "type": "SCALAR",
+                    }
+                )
+                gltf["meshes"].append(
+                    {"name": name, "primitives": [{"attributes": {"POSITION": accessor}, "indices": accessor + 1}]}
+                )
+                gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]))
+                gltf["nodes"].append({"name": name, "mesh": len(gltf["meshes"]) - 1})
+
+        if triangles == 0:
+            raise RuntimeError("No triangles left to export.")
+
+        if stl:
+            stl.seek(80)
+            stl.write(struct.pack("<I", triangles))
+
+        if bin_chunk:
+            gltf["buffers"].append({"byteLength": bin_length})
+            header = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+            header += b" " * (-len(header) % 4)
+            with open(glb_path, "wb") as glb:
+                glb.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(header) + 8 + bin_length))
+                glb.write(struct.pack("<I4s", len(header), b"JSON"))
+                glb.write(header)
+                glb.write(struct.pack("<I4s", bin_length, b"BIN\x00"))
+                bin_chunk.seek(0)
+                shutil.copyfileobj(bin_chunk, glb)
+    except BaseException:
+        if stl:
+            stl.close()
+            os.remove(stl_path)
+        raise
+    finally:
+        if stl:
+            stl.close()
+        if bin_chunk:
+            bin_chunk.close()
+
+    return triangles
@@ -0,0 +1,92 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+import trimesh
+
+
+def _extrude_chunk(start, wkbs, heights, base_z):
+    vertices = []
+    faces = []
+    failures = []
+    for k, (wkb, h, z) in enumerate(zip(wkbs, heights, base_z)):
+        try:
+            geom = shapely.from_wkb(wkb)
+            mesh = trimesh.creation.extrude_polygon(geom, h)
+        except Exception as e:
+            failures.append((start + k, f"{type(e).__name__}: {e}"))
+            continue
+        if len(mesh.faces) == 0:
+            failures.append((start + k, "empty mesh"))
+            continue
+        v = mesh.vertices.copy()
+        v[:, 2] += z
+        vertices.append(v)
+        faces.append(mesh.faces)
+    # Merge here so each worker sends back two arrays, not one per building.
+    merged_vertices, merged_faces = merge_arrays(vertices, faces)
+    return merged_vertices, merged_faces, failures
+
+
+def merge_arrays(vertices, faces):
+    """Concatenates per-mesh arrays, shifting each face block by its vertex offset."""
+    if not vertices:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64)
+    counts = np.array([len(v) for v in vertices])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    merged_faces = np.concatenate([f + o for f, o in zip(faces, offsets)])
+    return np.concatenate(vertices), merged_faces
+
+
+def extrude_buildings(geoms, heights, base_z, workers=None, chunk_size=500):
+    """Extrudes building footprints in parallel into one merged mesh.
+
+    Footprints are split into chunks of ``chunk_size`` and extruded in a
+    process pool (serially when ``workers`` is 1). Returns the merged mesh,
+    or None if nothing could be extruded, together with a list of
+    ``(index, reason)`` tuples for the footprints that failed.
+    """
+    wkbs = shapely.to_wkb(np.asarray(geoms, dtype=object))
+    heights = np.asarray(heights, dtype=float)
+    base_z = np.asarray(base_z, dtype=float)
+
+    chunks = [
+        (start, wkbs[start:start + chunk_size], heights[start:start + chunk_size], base_z[start:start + chunk_size])
+        for start in range(0, len(wkbs), chunk_size)
+    ]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_extrude_chunk, *zip(*chunks)))
+    else:
+        results = [_extrude_chunk(*chunk) for chunk in chunks]
+
+    vertices = []
+    faces = []
+    failures = []
+    for v, f, err in results:
+        if len(f):
+            vertices.append(v)
+            faces.append(f)
+        failures += err
+
+    if not vertices:
+        return None, failures
+
+    merged_vertices, merged_faces = merge_arrays(vertices, faces)
+    return trimesh.Trimesh(vertices=merged_vertices, faces=merged_faces, process=False), failures
+
+
+def summarize_failures(failures, total, width=80):
+    """One line with how many buildings failed and each distinct reason, cut to ``width`` characters."""
+    if not failures:
+        return f"Extruded {total} buildings"
+    reasons = Counter(reason if len(reason) <= width else reason[: width - 3] + "..." for _, reason in failures)
+    detail = "; ".join(f"{reason} x{count}" for reason, count in reasons.most_common())
+    return f"Extruded {total - len(failures)}/{total} buildings; {len(failures)} failed ({detail})"
@@ -0,0 +1,286 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import trimesh
+
+from modules.buildings import (
+    building_heights,
+    clean_polygons,
+    clip_to_box,
+    download_footprints,
+    read_footprints,
+    wgs84_to_projected,
+)
+from modules.cache import StageCache, file_signature
+from modules.export import export_meshes
+from modules.extrude import extrude_buildings, summarize_failures
+from modules.terrain import (
+    build_terrain,
+    dem_decimation,
+    elevation_at_xy,
+    heightfield_mesh,
+    terrain_at_xy,
+    terrain_axes,
+    terrain_stats,
+)
+
+SANTANDER_BOUNDS = (-3.817667, 43.46063, -3.765713, 43.47899)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+
+
+def load_footprints(cache, place="Santander", tags=None, footprints_path=None, offline=False):
+    """Returns the projected footprints and their cache key.
+
+    In offline mode the network is never used: footprints come from
+    ``footprints_path`` or from a previous run's cache.
+    """
+    if footprints_path is not None:
+        key = cache.key("footprints", source=file_signature(footprints_path))
+        return cache.frame("footprints", key, lambda: read_footprints(footprints_path)), key
+
+    tags = tags or {"building": True}
+    key = cache.key("footprints", place=place, tags=tags)
+    if offline and not cache.has("footprints", key, ".parquet"):
+        raise RuntimeError(f"Offline mode: no cached footprints for {place!r} and no footprints file given.")
+
+    def download():
+        print("Downloading buildings...")
+        return download_footprints(place, tags)
+
+    return cache.frame("footprints", key, download), key
+
+
+def prepare_buildings(cache, footprints, footprints_key, bounds, simplify_tolerance=1.0, min_area=20.0, max_height=60.0):
+    """Clips and cleans the footprints to ``bounds`` and attaches their heights."""
+    crs = footprints.crs.to_string()
+    clean_key = cache.key(
+        "clean",
+        footprints=footprints_key,
+        bounds=bounds,
+        crs=crs,
+        simplify_tolerance=simplify_tolerance,
+        min_area=min_area,
+    )
+    buildings = cache.frame(
+        "clean",
+        clean_key,
+        lambda: clean_polygons(clip_to_box(footprints, bounds), simplify_tolerance=simplify_tolerance, min_area=min_area),
+    )
+    if buildings is None or buildings.empty:
+        raise RuntimeError("No buildings found inside the clip bounds.")
+
+    heights_key = cache.key("heights", clean=clean_key, max_height=max_height)
+    heights = cache.arrays("heights", heights_key, lambda: {"height": building_heights(buildings, max_height=max_height)})
+    buildings["height"] = heights["height"]
+    return buildings
+
+
+def split_tiles(xs, ys, tiles):
+    """Splits the grid axes into ``tiles`` = (columns, rows) pieces that share their edge nodes."""
+    nx, ny = tiles
+    if nx < 1 or ny < 1 or len(xs) - 1 < nx or len(ys) - 1 < ny:
+        raise RuntimeError(f"Cannot split a {len(xs)}x{len(ys)} grid into {nx}x{ny} tiles.")
+
+    cuts_x = np.linspace(0, len(xs) - 1, nx + 1).round().astype(int)
+    cuts_y = np.linspace(0, len(ys) - 1, ny + 1).round().astype(int)
+    return [
+        (row, col, xs[cuts_x[col]:cuts_x[col + 1] + 1], ys[cuts_y[row]:cuts_y[row + 1] + 1])
+        for row in range(ny)
+        for col in range(nx)
+    ]
+
+
+def _build_tile(job):
+    xs = job["xs"]
+    ys = job["ys"]
+    buildings = job["buildings"]
+    cache = job["cache"]
+    bounds = (xs[0], ys[0], xs[-1], ys[-1])
+
+    def terrain():
+        _, (_, _, z) = build_terrain(
+            job["dem_path"],
+            xs,
+            ys,
+            job["crs"],
+            z_scale=job["z_scale"],
+            decimation=job["decimation"],
+            z_base=job["z_base"],
+            fill=job["fill"],
+        )
+        return {"z": z}
+
+    terrain_key = cache.key(
+        "terrain",
+        dem=file_signature(job["dem_path"]),
+        crs=job["crs"],
+        bounds=bounds,
+        grid_step=job["grid_step"],
+        z_scale=job["z_scale"],
+        z_base=job["z_base"],
+        fill=job["fill"],
+        decimation=job["decimation"],
+    )
+    zgrid = cache.arrays("terrain", terrain_key, terrain)["z"]
+
+    # Pieces of buildings anchored in a neighbouring tile are sampled on the
+    # shared area grid, so every piece of a building sits at the same height.
+    ax = buildings.anchor_x.to_numpy()
+    ay = buildings.anchor_y.to_numpy()
+    base_z = elevation_at_xy(ax, ay, xs, ys, zgrid)
+    outside = (ax < bounds[0]) | (ax > bounds[2]) | (ay < bounds[1]) | (ay > bounds[3])
+    if outside.any():
+        base_z[outside] = terrain_at_xy(
+            job["dem_path"],
+            ax[outside],
+            ay[outside],
+            job["area_xs"],
+            job["area_ys"],
+            job["crs"],
+            job["z_base"],
+            job["fill"],
+            job["z_scale"],
+            job["decimation"],
+        )
+
+    meshes = []
+    names = []
+    terrain_mesh = heightfield_mesh(xs, ys, zgrid)
+    if terrain_mesh is not None:
+        meshes.append(terrain_mesh)
+        names.append("terrain")
+
+    if not buildings.empty:
+        buildings_mesh, failures = extrude_buildings(
+            buildings.geometry, buildings.height, base_z, workers=job["workers"]
+        )
+        print(f"{job['label']}: {summarize_failures(failures, len(buildings))}")
+        if buildings_mesh is not None:
+            meshes.append(buildings_mesh)
+            names.append("buildings")
+
+    if not meshes:
+        raise RuntimeError(f"{job['label']}: no meshes could be created.")
+
+    width = bounds[2] - bounds[0]
+    depth = bounds[3] - bounds[1]
+    base_thickness = job["base_thickness"]
+    base = trimesh.creation.box(extents=(width, depth, base_thickness))
+    base.apply_translation((bounds[0] + width / 2.0, bounds[1] + depth / 2.0, -base_thickness / 2.0))
+    meshes.append(base)
+    names.append("base")
+
+    glb_path = f"{job['output']}.glb"
+    stl_path = f"{job['output']}.stl"
+    triangles = export_meshes(
+        meshes,
+        names,
+        glb_path=glb_path,
+        stl_path=stl_path,
+        offset=(-bounds[0], -bounds[1], 0.0),
+        weld=job["weld"],
+        drop_degenerate=job["drop_degenerate"],
+    )
+    print(f"{job['label']}: exported {triangles} triangles to {glb_path} and {stl_path}")
+    return glb_path, stl_path
+
+
+def generate_city_model(
+    dem_path,
+    bounds=SANTANDER_BOUNDS,
+    output_dir=".",
+    name="santander_city_model",
+    grid_step=10.0,
+    margin=200.0,
+    max_height=60.0,
+    min_area=20.0,
+    simplify_tolerance=1.0,
+    z_scale=1.5,
+    base_ratio=0.015,
+    tiles=(1, 1),
+    place="Santander",
+    footprints_path=None,
+    offline=False,
+    cache_dir=CACHE_DIR,
+    use_cache=True,
+    workers=None,
+    weld=False,
+    drop_degenerate=False,
+):
+    """Builds the printable city model for the WGS84 ``bounds`` and writes GLB and STL files.
+
+    With ``tiles`` = (columns, rows) above (1, 1) the area is cut into print
+    tiles that are built in parallel, each written as ``<name>_r<row>_c<col>``.
+    Tiles share one terrain grid, base height and nodata fill, so their
+    edges match. ``weld`` and ``drop_degenerate`` clean each mesh on export.
+    Returns the list of (glb, stl) paths written.
+    """
+    cache = StageCache(cache_dir, enabled=use_cache)
+    footprints, footprints_key = load_footprints(
+        cache, place=place, footprints_path=footprints_path, offline=offline
+    )
+    crs = footprints.crs.to_string()
+
+    minx, miny, maxx, maxy = wgs84_to_projected(bounds, crs)
+    area = (minx - margin, miny - margin, maxx + margin, maxy + margin)
+    buildings = prepare_buildings(
+        cache,
+        footprints,
+        footprints_key,
+        area,
+        simplify_tolerance=simplify_tolerance,
+        min_area=min_area,
+        max_height=max_height,
+    )
+    del footprints
+
+    xs, ys = terrain_axes(area, grid_step)
+    decimation = dem_decimation(dem_path, area, crs, grid_step)
+    single = tuple(tiles) == (1, 1)
+    parallel_tiles = not single and workers != 1
+    # A single tile normalizes its terrain by itself; tiles share a base
+    # elevation and nodata fill taken from a coarse read of the whole area.
+    z_base, fill = (None, None) if single else terrain_stats(dem_path, xs, ys, crs, decimation)
+
+    # Anchors use the unclipped footprint so pieces of a building cut by a
+    # tile edge all sit at the same height.
+    anchors = buildings.geometry.representative_point()
+    buildings["anchor_x"] = anchors.x.to_numpy()
+    buildings["anchor_y"] = anchors.y.to_numpy()
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for row, col, tile_xs, tile_ys in split_tiles(xs, ys, tiles):
+        label = name if single else f"{name}_r{row}_c{col}"
+        tile_buildings = clip_to_box(buildings, (tile_xs[0], tile_ys[0], tile_xs[-1], tile_ys[-1]))
+        jobs.append(
+            {
+                "label": label,
+                "output": os.path.join(output_dir, label),
+                "xs": tile_xs,
+                "ys": tile_ys,
+                "area_xs": xs,
+                "area_ys": ys,
+                "buildings": tile_buildings,
+                "dem_path": dem_path,
+                "crs": crs,
+                "grid_step": grid_step,
+                "z_scale": z_scale,
+                "z_base": z_base,
+                "fill": fill,
+                "decimation": decimation,
+                "base_thickness": (area[2] - area[0]) * base_ratio,
+                "cache": cache,
+                "workers": 1 if parallel_tiles else workers,
+                "weld": weld,
+                "drop_degenerate": drop_degenerate,
+            }
+        )
+    del buildings
+
+    print(f"Creating 3D meshes for {len(jobs)} tile(s)...")
+    if parallel_tiles:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_build_tile, jobs))
+    return [_build_tile(job) for job in jobs]
@@ -0,0 +1,286 @@
+import math
+
+import numpy as np
+import trimesh
+
+
+def _pixel_coords(transform, x, y):
+    inv = ~transform
+    cols = inv.a * x + inv.b * y + inv.c
+    rows = inv.d * x + inv.e * y + inv.f
+    return cols, rows
+
+
+def _bilinear(grid, u, v):
+    """Samples ``grid`` at fractional (column, row) coordinates ``u``, ``v``."""
+    h, w = grid.shape
+    u = np.clip(u, 0.0, w - 1)
+    v = np.clip(v, 0.0, h - 1)
+    i = np.minimum(np.floor(u).astype(np.intp), max(w - 2, 0))
+    j = np.minimum(np.floor(v).astype(np.intp), max(h - 2, 0))
+    i1 = np.minimum(i + 1, w - 1)
+    j1 = np.minimum(j + 1, h - 1)
+    tx = u - i
+    ty = v - j
+
+    z00 = grid[j, i]
+    z10 = grid[j, i1]
+    z01 = grid[j1, i]
+    z11 = grid[j1, i1]
+
+    return (1 - tx) * (1 - ty) * z00 + tx * (1 - ty) * z10 + (1 - tx) * ty * z01 + tx * ty * z11
+
+
+def _read_dem_block(dem, cols, rows, decimation):
+    """Reads the DEM block covering the given pixel coordinates in one call.
+
+    The block is aligned to multiples of ``decimation`` and only spans whole
+    coarse pixels, so two reads covering the same pixels always see the same
+    decimated lattice. A partial coarse pixel at the right or bottom edge of
+    the DEM is never read; points there take the last whole one. When
+    ``decimation`` is above one the read is averaged down, which lets GDAL
+    serve it from the file overviews if there are any.
+    """
+    from rasterio.enums import Resampling
+    from rasterio.windows import Window
+
+    f = decimation
+    # Coarse lattice coordinates: coarse pixel k covers full pixels [k*f, (k+1)*f).
+    cu = cols / f - 0.5
+    cv = rows / f - 0.5
+
+    coarse_w = max(dem.width // f, 1)
+    coarse_h = max(dem.height // f, 1)
+    k0 = int(np.clip(np.floor(np.nanmin(cu)), 0, coarse_w - 1))
+    k1 = int(np.clip(np.floor(np.nanmax(cu)) + 1, 0, coarse_w - 1))
+    l0 = int(np.clip(np.floor(np.nanmin(cv)), 0, coarse_h - 1))
+    l1 = int(np.clip(np.floor(np.nanmax(cv)) + 1, 0, coarse_h - 1))
+
+    col_off = k0 * f
+    row_off = l0 * f
+    width = min((k1 + 1) * f, dem.width) - col_off
+    height = min((l1 + 1) * f, dem.height) - row_off
+    out_shape = (l1 - l0 + 1, k1 - k0 + 1)
+
+    block = dem.read(
+        1,
+        window=Window(col_off, row_off, width, height),
+        out_shape=out_shape,
+        resampling=Resampling.average if f > 1 else Resampling.nearest,
+        masked=True,
+    )
+    block = np.ma.filled(block.astype(float), np.nan)
+    return block, cu - k0, cv - l0
+
+
+def sample_dem(dem_path, x, y, crs, decimation=1):
+    """Returns bilinear DEM elevations at the points ``x``, ``y`` given in ``crs``.
+
+    Points are reprojected in bulk and the DEM is read once, limited to the
+    window that covers them. Points outside the DEM or on nodata come back
+    as NaN.
+    """
+    import rasterio
+    from pyproj import Transformer
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.size == 0:
+        return np.empty(0)
+
+    with rasterio.open(dem_path) as dem:
+        if dem.crs is None:
+            raise RuntimeError("DEM has no CRS.")
+
+        transformer = Transformer.from_crs(crs, dem.crs, always_xy=True)
+        rx, ry = transformer.transform(x, y)
+        cols, rows = _pixel_coords(dem.transform, np.asarray(rx), np.asarray(ry))
+
+        outside = ~np.isfinite(cols) | ~np.isfinite(rows)
+        outside |= (cols < 0) | (cols > dem.width) | (rows < 0) | (rows > dem.height)
+        if outside.all():
+            return np.full(x.shape, np.nan)
+
+        block, u, v = _read_dem_block(dem, cols[~outside], rows[~outside], decimation)
+
+    z = np.full(x.shape, np.nan)
+    z[~outside] = _bilinear(block, u, v)
+    return z
+
+
+def dem_decimation(dem_path, bounds, crs, grid_step):
+    """Picks a DEM decimation factor giving about two DEM pixels per grid step."""
+    import rasterio
+    from pyproj import Transformer
+
+    minx, miny, maxx, maxy = bounds
+    cx = (minx + maxx) / 2.0
+    cy = (miny + maxy) / 2.0
+
+    with rasterio.open(dem_path) as dem:
+        if dem.crs is None:
+            raise RuntimeError("DEM has no CRS.")
+
+        transformer = Transformer.from_crs(crs, dem.crs, always_xy=True)
+        rx, ry = transformer.transform(
+            np.array([cx, cx + grid_step, cx]), np.array([cy, cy, cy + grid_step])
+        )
+        cols, rows = _pixel_coords(dem.transform, np.asarray(rx), np.asarray(ry))
+
+    step_px = min(
+        math.hypot(cols[1] - cols[0], rows[1] - rows[0]),
+        math.hypot(cols[2] - cols[0], rows[2] - rows[0]),
+    )
+    return max(1, int(step_px // 2))
+
+
+def heightfield_mesh(xs, ys, zgrid):
+    nx = len(xs)
+    ny = len(ys)
+    if nx < 2 or ny < 2:
+        return None
+
+    X, Y = np.meshgrid(xs, ys)
+    # The bottom sits at 0 unless the terrain dips below it, which can
+    # happen when tiles share an approximate base elevation.
+    bottom = min(0.0, float(np.min(zgrid)))
+    top_vertices = np.column_stack([X.ravel(), Y.ravel(), zgrid.ravel()])
+    bottom_vertices = np.column_stack([X.ravel(), Y.ravel(), np.full(nx * ny, bottom)])
+    vertices = np.vstack([top_vertices, bottom_vertices])
+
+    top_count = nx * ny
+    vid = np.arange(top_count).reshape(ny, nx)
+
+    v0 = vid[:-1, :-1].ravel()
+    v1 = vid[:-1, 1:].ravel()
+    v2 = vid[1:, :-1].ravel()
+    v3 = vid[1:, 1:].ravel()
+    b0, b1, b2, b3 = (v + top_count for v in (v0, v1, v2, v3))
+
+    def wall(a, b, flip):
+        ba = a + top_count
+        bb = b + top_count
+        if flip:
+            return [np.column_stack([a, bb, b]), np.column_stack([a, ba, bb])]
+        return [np.column_stack([a, b, bb]), np.column_stack([a, bb, ba])]
+
+    faces = [
+        np.column_stack([v0, v1, v3]),
+        np.column_stack([v0, v3, v2]),
+        np.column_stack([b0, b3, b1]),
+        np.column_stack([b0, b2, b3]),
+    ]
+    faces += wall(vid[0, :-1], vid[0, 1:], flip=False)
+    faces += wall(vid[-1, :-1], vid[-1, 1:], flip=True)
+    faces += wall(vid[:-1, 0], vid[1:, 0], flip=True)
+    faces += wall(vid[:-1, -1], vid[1:, -1], flip=False)
+
+    return trimesh.Trimesh(vertices=vertices, faces=np.vstack(faces), process=False)
+
+
+def elevation_at_xy(x, y, xs, ys, zgrid):
+    """Bilinear terrain heights at the points ``x``, ``y``; 0.0 outside the grid."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    i = np.clip(np.searchsorted(xs, x) - 1, 0, len(xs) - 2)
+    j = np.clip(np.searchsorted(ys, y) - 1, 0, len(ys) - 2)
+
+    x1 = xs[i]
+    dx = xs[i + 1] - x1
+    y1 = ys[j]
+    dy = ys[j + 1] - y1
+
+    tx = np.divide(x - x1, dx, out=np.zeros_like(x), where=dx != 0)
+    ty = np.divide(y - y1, dy, out=np.zeros_like(y), where=dy != 0)
+
+    z00 = zgrid[j, i]
+    z10 = zgrid[j, i + 1]
+    z01 = zgrid[j + 1, i]
+    z11 = zgrid[j + 1, i + 1]
+
+    z = (1 - tx) * (1 - ty) * z00 + tx * (1 - ty) * z10 + (1 - tx) * ty * z01 + tx * ty * z11
+    outside = (x < xs[0]) | (x > xs[-1]) | (y < ys[0]) | (y > ys[-1])
+    return np.where(outside, 0.0, z)
+
+
+def terrain_axes(bounds, grid_step):
+    minx, miny, maxx, maxy = bounds
+    xs = np.arange(minx, maxx + grid_step, grid_step)
+    ys = np.arange(miny, maxy + grid_step, grid_step)
+    if len(xs) < 2 or len(ys) < 2:
+        raise RuntimeError("Grid resolution too coarse for bounds.")
+    return xs, ys
+
+
+def _normalize(z, z_base, fill, z_scale):
+    if fill is None:
+        fill = np.nanmedian(z)
+    z = np.where(np.isnan(z), fill, z)
+    if z_base is None:
+        z_base = float(np.min(z))
+    return (z - z_base) * z_scale
+
+
+def terrain_stats(dem_path, xs, ys, crs, decimation=1, max_nodes=65_536):
+    """Returns approximate (base, fill) elevations of a large grid.
+
+    Large grids are sampled on a strided subset of nodes from a DEM read
+    decimated by the same stride, so the whole area is never read at full
+    resolution. The base is the minimum of that coarse read, so the true
+    terrain may dip slightly below it.
+    """
+    stride = max(1, math.ceil(math.sqrt(len(xs) * len(ys) / max_nodes)))
+    X, Y = np.meshgrid(xs[::stride], ys[::stride])
+    z = sample_dem(dem_path, X.ravel(), Y.ravel(), crs, decimation * stride)
+    if np.isnan(z).all():
+        raise RuntimeError("DEM returned all nodata.")
+    fill = float(np.nanmedian(z))
+    return float(np.min(np.where(np.isnan(z), fill, z))), fill
+
+
+def build_terrain(dem_path, xs, ys, target_crs, z_scale=1.5, decimation=None, z_base=None, fill=None):
+    """Samples the DEM on the ``xs`` x ``ys`` grid and builds the terrain solid.
+
+    Heights are ``(z - z_base) * z_scale`` with nodata replaced by ``fill``;
+    both default to the grid's own minimum and median. Tiles of a larger
+    area pass shared values so that their edges line up.
+    """
+    if decimation is None:
+        decimation = dem_decimation(dem_path, (xs[0], ys[0], xs[-1], ys[-1]), target_crs, xs[1] - xs[0])
+
+    X, Y = np.meshgrid(xs, ys)
+    z = sample_dem(dem_path, X.ravel(), Y.ravel(), target_crs, decimation).reshape(Y.shape)
+    if np.isnan(z).all() and fill is None:
+        raise RuntimeError("DEM returned all nodata.")
+
+    z = _normalize(z, z_base, fill, z_scale)
+    return heightfield_mesh(xs, ys, z), (xs, ys, z)
+
+
+def terrain_at_xy(dem_path, x, y, xs, ys, crs, z_base, fill, z_scale=1.5, decimation=1):
+    """Same as ``elevation_at_xy`` on the terrain of ``xs`` x ``ys``, without sampling the whole grid.
+
+    Only the four grid nodes around each point are read from the DEM, so
+    points anywhere in a large area get the height the terrain has there.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    i = np.clip(np.searchsorted(xs, x) - 1, 0, len(xs) - 2)
+    j = np.clip(np.searchsorted(ys, y) - 1, 0, len(ys) - 2)
+    node_x = np.concatenate([xs[i], xs[i + 1], xs[i], xs[i + 1]])
+    node_y = np.concatenate([ys[j], ys[j], ys[j + 1], ys[j + 1]])
+    z = _normalize(sample_dem(dem_path, node_x, node_y, crs, decimation), z_base, fill, z_scale)
+    z00, z10, z01, z11 = z.reshape(4, -1)
+
+    x1 = xs[i]
+    dx = xs[i + 1] - x1
+    y1 = ys[j]
+    dy = ys[j + 1] - y1
+    tx = np.divide(x - x1, dx, out=np.zeros_like(x), where=dx != 0)
+    ty = np.divide(y - y1, dy, out=np.zeros_like(y), where=dy != 0)
+
+    z = (1 - tx) * (1 - ty) * z00 + tx * (1 - ty) * z10 + (1 - tx) * ty * z01 + tx * ty * z11
+    outside = (x < xs[0]) | (x > xs[-1]) | (y < ys[0]) | (y > ys[-1])
+    return np.where(outside, 0.0, z)
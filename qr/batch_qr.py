@@ -0,0 +1,156 @@
+import argparse
+import csv
+import hashlib
+import io
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import segno
+
+
+def clean_filename(filename):
+    # Leading dots would make "../x" a hidden ".x" file.
+    return "".join(c for c in filename if c.isalnum() or c in "._- ").strip(". ")
+
+
+def payload_hash(payload, kind, scale, border, error):
+    """Content address of a rendered code: same payload and options, same file."""
+    key = "\x1f".join([segno.__version__, payload, kind, str(scale), str(border), error])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def render(payload, kind="svg", scale=10, border=4, error="m"):
+    qrcode = segno.make_qr(payload, error=error)
+    out = io.BytesIO()
+    qrcode.save(out, kind=kind, scale=scale, border=border)
+    return out.getvalue()
+
+
+def _render_to_cache(job):
+    path, payload, kind, scale, border, error = job
+    data = render(payload, kind, scale, border, error)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_rows(csv_path, template="{url}", id_column="id"):
+    """Returns (id, payload) pairs from a CSV, filling ``template`` with each row's columns."""
+    rows = []
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for i, row in enumerate(csv.DictReader(f), start=1):
+            rows.append((row.get(id_column) or str(i), template.format(**row)))
+    return rows
+
+
+def generate_batch(rows, output, kind="svg", scale=10, border=4, error="m", pack=None, cache_dir="qr-cache", workers=None):
+    """Generates one QR code per (id, payload) row.
+
+    Codes are rendered in parallel into ``cache_dir`` under the hash of
+    their payload and options, so unchanged rows are never rendered twice.
+    Without ``pack`` they are copied to ``output`` as ``<id>.<kind>``; with
+    ``pack`` set to "zip" or "pdf" they are packed into the single file
+    ``output`` instead (PDF output renders PNGs, one code per page).
+    Raises ValueError, before rendering anything, if there are no rows, if
+    ``pack`` is unknown or if two rows would end up with the same file name.
+    Returns a dict with counts and throughput.
+    """
+    start = time.perf_counter()
+    if pack not in (None, "zip", "pdf"):
+        raise ValueError(f"Unknown pack format: {pack}")
+    if not rows:
+        raise ValueError("No rows to generate QR codes for.")
+    if pack == "pdf":
+        kind = "png"
+    ext = kind.lower()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    entries = []
+    missing = {}
+    for row_id, payload in rows:
+        digest = payload_hash(payload, ext, scale, border, error)
+        path = os.path.join(cache_dir, f"{digest}.{ext}")
+        entries.append((clean_filename(row_id) or digest[:12], path))
+        if not os.path.exists(path) and path not in missing:
+            missing[path] = (path, payload, ext, scale, border, error)
+
+    # Names are compared case-insensitively, as they are on Windows and macOS.
+    seen = {}
+    for (row_id, _), (name, _) in zip(rows, entries):
+        seen.setdefault(name.casefold(), []).append(row_id)
+    duplicates = [ids for ids in seen.values() if len(ids) > 1]
+    if duplicates:
+        listed = "; ".join(", ".join(repr(i) for i in ids) for ids in duplicates[:5])
+        raise ValueError(f"{len(duplicates)} file name(s) shared by several rows: {listed}")
+
+    jobs = list(missing.values())
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_render_to_cache, jobs, chunksize=max(1, len(jobs) // 64)))
+    else:
+        for job in jobs:
+            _render_to_cache(job)
+
+    if pack == "zip":
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, path in entries:
+                archive.write(path, f"{name}.{ext}")
+    elif pack == "pdf":
+        from PIL import Image
+
+        pages = [Image.open(path).convert("1") for _, path in entries]
+        pages[0].save(output, "PDF", save_all=True, append_images=pages[1:])
+    else:
+        os.makedirs(output, exist_ok=True)
+        for name, path in entries:
+            shutil.copyfile(path, os.path.join(output, f"{name}.{ext}"))
+
+    elapsed = time.perf_counter() - start
+    return {
+        "codes": len(entries),
+        "rendered": len(jobs),
+        "cached": len(entries) - len(jobs),
+        "seconds": elapsed,
+        "codes_per_second": len(entries) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate QR codes in bulk from a CSV file.")
+    parser.add_argument("csv", help="CSV file with one row per code")
+    parser.add_argument("output", help="output directory, or the .zip/.pdf file with --pack")
+    parser.add_argument("--template", default="{url}", help="payload built from the row columns, e.g. 'https://esnsantander.org/esncard?id={id}'")
+    parser.add_argument("--id-column", default="id", help="column used to name each file")
+    parser.add_argument("--kind", default="svg", choices=["svg", "png", "eps", "pdf"], help="format of each code")
+    parser.add_argument("--scale", type=int, default=10, help="size of one module in pixels (PNG) or units (SVG)")
+    parser.add_argument("--border", type=int, default=4, help="quiet zone in modules")
+    parser.add_argument("--error", default="m", choices=["l", "m", "q", "h"], help="error correction level")
+    parser.add_argument("--pack", choices=["zip", "pdf"], help="pack all codes into a single file")
+    parser.add_argument("--cache-dir", default="qr-cache", help="where rendered codes are kept between runs")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    rows = read_rows(args.csv, args.template, args.id_column)
+    stats = generate_batch(
+        rows,
+        args.output,
+        kind=args.kind,
+        scale=args.scale,
+        border=args.border,
+        error=args.error,
+        pack=args.pack,
+        cache_dir=args.cache_dir,
+        workers=args.workers,
+    )
+    print(
+        f"{stats['codes']} codes ({stats['rendered']} rendered, {stats['cached']} cached) "
+        f"in {stats['seconds']:.2f} s, {stats['codes_per_second']:.0f} codes/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,5 @@ import segno
 qrcode = segno.make_qr("https://esnsantander.org/esncard")
 qrcode.save(
     "esncard_qrcode.png",
-    scale=100,
+    scale=10,
 )
\ No newline at end of file